@@ -1,10 +1,21 @@
 from flask import Flask, render_template, request, jsonify
-from pph_core import PasswordHardener
+from pph_core import PasswordHardener, run_in_pool
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 app = Flask(__name__)
 pph = PasswordHardener()
 
+def ojsonify(obj):
+    """jsonify() that serializes with orjson when it is installed"""
+    if orjson is None:
+        return jsonify(obj)
+    return app.response_class(orjson.dumps(obj), mimetype='application/json')
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -24,10 +35,11 @@ def harden_password():
         }
         
         if not base_password:
-            return jsonify({'error': 'Password is required'}), 400
+            return ojsonify({'error': 'Password is required'}), 400
         
         # Harden the password
-        result = pph.harden_password(base_password, metadata)
+        # PBKDF2 runs on pph_core's shared pool, capped at one worker per core
+        result = run_in_pool(pph.harden_password_fast, base_password, metadata)
         
         # Analyze original and hardened passwords
         original_analysis = pph.analyze_password_strength(base_password)
@@ -50,15 +62,16 @@ def harden_password():
             },
             'crypto_details': {
                 'algorithm': 'PBKDF2-HMAC-SHA256',
+                'backend': pph.pbkdf2_backend,
                 'iterations': result['iterations'],
                 'salt': result['salt']
             }
         }
         
-        return jsonify(response)
+        return ojsonify(response)
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojsonify({'error': str(e)}), 500
 
 @app.route('/analyze', methods=['POST'])
 def analyze_password():
@@ -67,17 +80,17 @@ def analyze_password():
         password = data.get('password', '')
         
         if not password:
-            return jsonify({'error': 'Password is required'}), 400
+            return ojsonify({'error': 'Password is required'}), 400
         
         analysis = pph.analyze_password_strength(password)
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'analysis': analysis
         })
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojsonify({'error': str(e)}), 500
 
 @app.route('/simulate-brute-force', methods=['POST'])
 def simulate_brute_force():
@@ -87,17 +100,17 @@ def simulate_brute_force():
         max_attempts = data.get('max_attempts', 10000)
         
         if not password:
-            return jsonify({'error': 'Password is required'}), 400
+            return ojsonify({'error': 'Password is required'}), 400
         
         result = pph.simulate_brute_force(password, max_attempts)
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'result': result
         })
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
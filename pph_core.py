@@ -3,15 +3,62 @@ import hmac
 import secrets
 import string
 import math
-from typing import Dict, List, Tuple
+import sys
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import ClassVar, Dict, List, Optional, Tuple
 import json
 
+try:
+    # Optional C backend; precomputes the HMAC pads once per derivation
+    from fastpbkdf2 import pbkdf2_hmac
+    PBKDF2_BACKEND = 'fastpbkdf2'
+except ImportError:
+    pbkdf2_hmac = hashlib.pbkdf2_hmac
+    # _hashlib is the OpenSSL binding, which picks SHA-NI/AVX code paths at runtime
+    PBKDF2_BACKEND = 'OpenSSL' if pbkdf2_hmac.__module__ == '_hashlib' else 'hashlib'
+
+# Alphabet for memorable passwords: upper, lower, digits and a few symbols.
+# Look-alikes (l, o, I, O, 0, 1) are left out so it has exactly 64 characters,
+# which divides 256 and keeps the byte -> character mapping free of bias.
+_CHARS = (
+    "abcdefghijkmnpqrstuvwxyz"
+    "ABCDEFGHJKLMNPQRSTUVWXYZ"
+    "23456789"
+    "!@#$%^&*"
+)
+_CHARS_LEN = len(_CHARS)
+# byte % _CHARS_LEN is only unbiased, and log2(_CHARS_LEN) bits per character
+# only honest, while the alphabet size divides 256
+assert 256 % _CHARS_LEN == 0, "memorable alphabet size must divide 256"
+
+# Upper bound on the guess buffer simulate_brute_force holds at once
+_BRUTE_BLOCK_BYTES = 1 << 20
+
+# The process's single PBKDF2 pool; it releases the GIL, so one worker per core
+_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+
+def run_in_pool(fn, *args):
+    """
+    Run fn(*args) on the shared worker pool and wait for its result.
+    fn must not itself call the batch APIs, which wait on the same pool.
+    """
+    return _EXECUTOR.submit(fn, *args).result()
+
+
 class PasswordHardener:
     """
     Personalized Password Hardener using cryptographic techniques
     and personal metadata to create strong, memorable passwords.
     """
     
+    # Default PBKDF2 work factor
+    ITERATIONS: ClassVar[int] = 100000
+    
     def __init__(self):
         self.metadata_weights = {
             'house_name': 0.2,
@@ -21,14 +68,57 @@ class PasswordHardener:
             'birthday_token': 0.15,
             'custom': 0.1
         }
+        self._metadata_keys = tuple(self.metadata_weights)
+        self._pbkdf2 = pbkdf2_hmac
+        self.pbkdf2_backend = PBKDF2_BACKEND
+        
+        # byte value -> memorable character, so mapping a key is one translate()
+        self._mem_table = bytes(ord(_CHARS[b % _CHARS_LEN]) for b in range(256))
+        self._hardened_bits_per_char = math.log2(_CHARS_LEN)
+        
+        self._punct_set = frozenset(string.punctuation)
+        
+        # ASCII byte -> character-class bitflag (lower=1, upper=2, digit=4, symbol=8)
+        self._class_table = bytes(
+            (1 if chr(b).islower() else 0) | (2 if chr(b).isupper() else 0) |
+            (4 if chr(b).isdigit() else 0) | (8 if chr(b) in string.punctuation else 0)
+            for b in range(128)
+        ) + bytes(128)
+        
+        # Character-class bitflags -> log2(charset size), 0.0 when no class is present
+        class_sizes = (26, 26, 10, 32)
+        self._charset_log2 = []
+        for flags in range(16):
+            charset_size = sum(size for bit, size in enumerate(class_sizes) if flags & (1 << bit))
+            self._charset_log2.append(math.log2(charset_size) if charset_size else 0.0)
+        
+        # Random byte -> brute-force guess character; the top 256 % 62 byte
+        # values are dropped so every character stays equally likely
+        brute_chars = (string.ascii_lowercase + string.ascii_uppercase + string.digits).encode('ascii')
+        usable = 256 - 256 % len(brute_chars)
+        self._brute_table = bytes(brute_chars[b % len(brute_chars)] for b in range(256))
+        self._brute_reject = bytes(range(usable, 256))
+        
+        time_units = [
+            ('centuries', 3153600000),
+            ('years', 31536000),
+            ('months', 2592000),
+            ('days', 86400),
+            ('hours', 3600),
+            ('minutes', 60),
+            ('seconds', 1)
+        ]
+        self._unit_log10 = [(unit, math.log10(divisor)) for unit, divisor in time_units]
+        
+        # Recently derived keys, so a retried verify skips the 100k iterations
+        self.cache_size = 1024
+        self.cache_ttl = 300  # seconds
+        self._derived_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
     
     def collect_metadata(self, metadata: Dict[str, str]) -> str:
         """Combine and normalize metadata fields"""
-        combined = ""
-        for key, value in metadata.items():
-            if value:
-                combined += value.strip().lower()
-        return combined
+        return "".join(value.strip().lower() for value in metadata.values() if value)
     
     def generate_salt(self) -> str:
         """Generate a cryptographically secure salt"""
@@ -36,130 +126,242 @@ class PasswordHardener:
     
     def compute_entropy(self, password: str) -> float:
         """Calculate password entropy in bits"""
-        charset_size = 0
-        if any(c.islower() for c in password):
-            charset_size += 26
-        if any(c.isupper() for c in password):
-            charset_size += 26
-        if any(c.isdigit() for c in password):
-            charset_size += 10
-        if any(c in string.punctuation for c in password):
-            charset_size += 32
+        flags = self._scan_flags(password)
+        entropy = len(password) * self._charset_log2[flags]
+        return round(entropy, 2)
+    
+    def _scan_flags(self, password: str) -> int:
+        """Return the character-class bitflags present in a password"""
+        if password.isascii():
+            # Classify every byte in C, then OR together the few distinct flags
+            flags = 0
+            for class_flag in set(password.encode('ascii').translate(self._class_table)):
+                flags |= class_flag
+            return flags
         
-        if charset_size == 0:
-            return 0.0
+        # Single pass over the password, stopping once every class is seen
+        flags = 0
+        for c in password:
+            if c.islower():
+                flags |= 1
+            elif c.isupper():
+                flags |= 2
+            elif c.isdigit():
+                flags |= 4
+            elif c in self._punct_set:
+                flags |= 8
+            else:
+                continue
+            if flags == 15:
+                break
         
-        entropy = len(password) * math.log2(charset_size)
-        return round(entropy, 2)
+        return flags
+    
+    def _pbkdf2_cached(self, password: bytes, salt: bytes, iterations: int) -> bytes:
+        """PBKDF2-HMAC-SHA256 behind a bounded cache whose entries expire after cache_ttl"""
+        key = (password, salt, iterations)
+        
+        with self._cache_lock:
+            self._expire_cache(time.monotonic())
+            entry = self._derived_cache.get(key)
+            if entry is not None:
+                return entry[1]
+        
+        derived = self._pbkdf2('sha256', password, salt, iterations, 32)
+        
+        with self._cache_lock:
+            now = time.monotonic()
+            self._expire_cache(now)
+            self._derived_cache.pop(key, None)
+            self._derived_cache[key] = (now, derived)
+            while len(self._derived_cache) > self.cache_size:
+                self._derived_cache.popitem(last=False)
+        
+        return derived
+    
+    def _expire_cache(self, now: float):
+        """Drop cached keys older than cache_ttl; caller holds _cache_lock"""
+        # Entries are kept in insertion order, so the stale ones are at the front
+        while self._derived_cache:
+            oldest = next(iter(self._derived_cache.values()))
+            if now - oldest[0] < self.cache_ttl:
+                break
+            self._derived_cache.popitem(last=False)
+    
+    def clear_cache(self):
+        """Drop cached derived keys, and with them the inputs they are keyed on"""
+        with self._cache_lock:
+            self._derived_cache.clear()
+    
+    def _combine_input(self, base_password: str, metadata_string: str) -> bytes:
+        """PBKDF2 password input for a base password and normalized metadata"""
+        return base_password.encode('utf-8') + b":" + metadata_string.encode('utf-8')
+    
+    def _derive_key(self, base_password: str, metadata_string: str,
+                    salt: str, iterations: int) -> bytes:
+        """Derive the raw key for verification, reusing recent derivations"""
+        return self._pbkdf2_cached(
+            self._combine_input(base_password, metadata_string),
+            salt.encode('utf-8'),
+            iterations
+        )
     
     def harden_password(self, base_password: str, metadata: Dict[str, str], 
-                       iterations: int = 100000) -> Dict:
+                       iterations: Optional[int] = None) -> Dict:
         """
         Main function to harden password using PBKDF2-HMAC-SHA256
         """
         # Collect and process metadata
         metadata_string = self.collect_metadata(metadata)
+        return self._harden(base_password, metadata_string, iterations)
+    
+    def harden_password_fast(self, base_password: str, metadata: Dict[str, str]) -> Dict:
+        """
+        harden_password specialised for the default iteration count and the
+        standard metadata layout: exactly the metadata_weights keys, inserted
+        in that order (as app.py builds them). Any other dict falls back to
+        harden_password, so the result always verifies with verify_password
+        given the same metadata.
+        """
+        if tuple(metadata) != self._metadata_keys:
+            return self.harden_password(base_password, metadata)
+        
+        metadata_string = "".join(
+            (metadata[key] or "").strip().lower() for key in self._metadata_keys
+        )
+        return self._harden(base_password, metadata_string, self.ITERATIONS)
+    
+    def _resolve_iterations(self, iterations: Optional[int]) -> int:
+        """Fall back to the ITERATIONS visible on this instance when none is given"""
+        return self.ITERATIONS if iterations is None else iterations
+    
+    def _harden(self, base_password: str, metadata_string: str,
+                iterations: Optional[int]) -> Dict:
+        """Derive and shape the hardened variants for normalized metadata"""
+        iterations = self._resolve_iterations(iterations)
         
         # Generate salt
         salt = self.generate_salt()
         
-        # Combine base password with metadata
-        combined_input = f"{base_password}:{metadata_string}"
-        
-        # Apply PBKDF2
-        hardened = hashlib.pbkdf2_hmac(
+        # Combine base password with metadata and apply PBKDF2; the salt is
+        # fresh, so the result could never be a cache hit and is not cached
+        hardened = self._pbkdf2(
             'sha256',
-            combined_input.encode('utf-8'),
+            self._combine_input(base_password, metadata_string),
             salt.encode('utf-8'),
-            iterations
+            iterations,
+            32
         )
         
-        # Convert to base64-like string
-        hardened_hex = hardened.hex()
-        
         # Create various strength outputs
         result = {
             'original_entropy': self.compute_entropy(base_password),
             'salt': salt,
             'iterations': iterations,
-            'hardened_full': hardened_hex,
-            'hardened_short': self._create_memorable_password(hardened_hex[:32]),
-            'hardened_medium': self._create_memorable_password(hardened_hex[:48]),
-            'hardened_long': self._create_memorable_password(hardened_hex[:64]),
+            'hardened_full': hardened.hex(),
+            'hardened_short': self._create_memorable_password(hardened[:16]),
+            'hardened_medium': self._create_memorable_password(hardened[:24]),
+            'hardened_long': self._create_memorable_password(hardened[:32]),
         }
         
-        # Calculate entropies
-        result['short_entropy'] = self.compute_entropy(result['hardened_short'])
-        result['medium_entropy'] = self.compute_entropy(result['hardened_medium'])
-        result['long_entropy'] = self.compute_entropy(result['hardened_long'])
+        # Every character is drawn from the fixed memorable alphabet, so the
+        # entropy follows from the length alone
+        result['short_entropy'] = round(16 * self._hardened_bits_per_char, 2)
+        result['medium_entropy'] = round(24 * self._hardened_bits_per_char, 2)
+        result['long_entropy'] = round(32 * self._hardened_bits_per_char, 2)
         
         return result
     
-    def _create_memorable_password(self, hex_string: str) -> str:
-        """Convert hex to more memorable password format"""
+    def harden_password_batch(self, requests: List[Tuple[str, Dict[str, str]]],
+                              iterations: Optional[int] = None) -> List[Dict]:
+        """
+        Harden several (base_password, metadata) pairs concurrently.
+        PBKDF2 releases the GIL, so independent derivations run in parallel.
+        """
+        return self._map_concurrently(
+            lambda item: self.harden_password(item[0], item[1], iterations),
+            requests
+        )
+    
+    def _map_concurrently(self, fn, items: List) -> List:
+        """Apply fn to every item on the shared worker pool, preserving order"""
+        return list(_EXECUTOR.map(fn, items))
+    
+    def _create_memorable_password(self, raw: bytes) -> str:
+        """Convert raw key bytes to more memorable password format"""
         # Mix of uppercase, lowercase, digits, and symbols
-        chars = string.ascii_letters + string.digits + "!@#$%^&*"
-        password = ""
-        
-        for i in range(0, len(hex_string), 2):
-            if i + 1 < len(hex_string):
-                byte_val = int(hex_string[i:i+2], 16)
-                password += chars[byte_val % len(chars)]
-        
-        return password
+        return raw.translate(self._mem_table).decode('ascii')
     
     def verify_password(self, base_password: str, metadata: Dict[str, str],
-                       salt: str, stored_hash: str, iterations: int = 100000) -> bool:
+                       salt: str, stored_hash: str, iterations: Optional[int] = None) -> bool:
         """Verify a password against stored hash"""
+        # Compare raw bytes rather than hex-encoding the derived key. Only the
+        # exact lower-case form hardened_full produces is accepted; anything
+        # else can never match, so skip the derivation for it
+        if len(stored_hash) != 64 or stored_hash != stored_hash.lower():
+            return False
+        try:
+            expected = bytes.fromhex(stored_hash)
+        except ValueError:
+            return False
+        
         metadata_string = self.collect_metadata(metadata)
-        combined_input = f"{base_password}:{metadata_string}"
+        computed = self._derive_key(base_password, metadata_string, salt,
+                                    self._resolve_iterations(iterations))
         
-        computed = hashlib.pbkdf2_hmac(
-            'sha256',
-            combined_input.encode('utf-8'),
-            salt.encode('utf-8'),
-            iterations
+        return hmac.compare_digest(computed, expected)
+    
+    def verify_batch(self, candidates: List[Tuple[str, Dict[str, str], str, str]],
+                     iterations: Optional[int] = None) -> List[bool]:
+        """
+        Verify several (base_password, metadata, salt, stored_hash) tuples
+        concurrently, in the same order they were given.
+        """
+        return self._map_concurrently(
+            lambda item: self.verify_password(*item, iterations),
+            candidates
         )
-        
-        return hmac.compare_digest(computed.hex(), stored_hash)
     
     def estimate_crack_time(self, entropy: float) -> Dict[str, str]:
         """Estimate time to crack password based on entropy"""
-        # Assume 1 billion attempts per second
+        # Assume 1 billion attempts per second; work in log10(seconds) so
+        # large entropies never materialize 2 ** entropy
         attempts_per_second = 1e9
-        total_combinations = 2 ** entropy
-        seconds = total_combinations / attempts_per_second
-        
-        time_units = [
-            ('centuries', 3153600000),
-            ('years', 31536000),
-            ('months', 2592000),
-            ('days', 86400),
-            ('hours', 3600),
-            ('minutes', 60),
-            ('seconds', 1)
-        ]
+        log10_seconds = entropy * math.log10(2) - math.log10(attempts_per_second)
         
-        for unit, divisor in time_units:
-            if seconds >= divisor:
-                value = seconds / divisor
+        for unit, log10_divisor in self._unit_log10:
+            if log10_seconds >= log10_divisor:
+                exponent = log10_seconds - log10_divisor
+                if exponent > sys.float_info.max_10_exp:
+                    # Beyond float range; report the cap as a lower bound
+                    value = 10.0 ** sys.float_info.max_10_exp
+                    return {
+                        'numeric': value,
+                        'unit': unit,
+                        'display': f"> {value} {unit}"
+                    }
+                
+                value = 10.0 ** exponent
                 return {
                     'numeric': round(value, 2),
                     'unit': unit,
                     'display': f"{round(value, 2)} {unit}"
                 }
         
+        seconds = 2 ** entropy / attempts_per_second
         return {'numeric': seconds, 'unit': 'seconds', 'display': f"{seconds} seconds"}
     
     def analyze_password_strength(self, password: str) -> Dict:
         """Comprehensive password strength analysis"""
+        # One scan feeds both the class flags and the entropy
+        flags = self._scan_flags(password)
         analysis = {
             'length': len(password),
-            'has_lowercase': any(c.islower() for c in password),
-            'has_uppercase': any(c.isupper() for c in password),
-            'has_digits': any(c.isdigit() for c in password),
-            'has_symbols': any(c in string.punctuation for c in password),
-            'entropy': self.compute_entropy(password)
+            'has_lowercase': bool(flags & 1),
+            'has_uppercase': bool(flags & 2),
+            'has_digits': bool(flags & 4),
+            'has_symbols': bool(flags & 8),
+            'entropy': round(len(password) * self._charset_log2[flags], 2)
         }
         
         analysis['crack_time'] = self.estimate_crack_time(analysis['entropy'])
@@ -184,22 +386,49 @@ class PasswordHardener:
         
         return analysis
     
+    def _find_aligned(self, pool: bytes, target: bytes, length: int) -> int:
+        """Index of the first length-byte guess in pool equal to target, or -1"""
+        # Let bytes.find scan in C; only hits on a guess boundary count
+        match = pool.find(target)
+        while match != -1 and match % length:
+            match = pool.find(target, match + 1)
+        return -1 if match == -1 else match // length
+    
     def simulate_brute_force(self, password: str, max_attempts: int = 1000000) -> Dict:
         """Simulate brute force attack (simplified)"""
-        charset = string.ascii_lowercase + string.ascii_uppercase + string.digits
-        attempts = 0
+        length = len(password)
+        target = password.encode('utf-8')
         
         # This is a simplified simulation for demonstration
         # Real brute force would be computationally intensive
-        for _ in range(min(max_attempts, 10000)):
-            attempts += 1
-            guess = ''.join(secrets.choice(charset) for _ in range(len(password)))
-            if guess == password:
+        total = max(min(max_attempts, 10000), 0)
+        
+        # The empty guess matches an empty password on the first attempt
+        if not length and total:
+            return {'cracked': True, 'attempts': 1, 'password': password}
+        
+        # Draw guesses from CSPRNG buffers of whole guesses rather than a call
+        # per character, a block at a time so memory stays bounded. Each block
+        # starts on a guess boundary, so every guess is searched in exactly one
+        # block and a hit straddling two blocks is misaligned by construction.
+        block_guesses = max(_BRUTE_BLOCK_BYTES // length, 1) if length else total
+        attempts = 0
+        while attempts < total:
+            count = min(block_guesses, total - attempts)
+            pool = b""
+            while len(pool) < count * length:
+                pool += secrets.token_bytes(count * length - len(pool)).translate(
+                    self._brute_table, self._brute_reject)
+            
+            index = self._find_aligned(pool, target, length)
+            if index != -1:
                 return {
                     'cracked': True,
-                    'attempts': attempts,
+                    'attempts': attempts + index + 1,
                     'password': password
                 }
+            
+            attempts += count
         
         return {
             'cracked': False,
@@ -258,6 +487,7 @@ if __name__ == "__main__":
     
     print("\n5. Cryptographic Details:")
     print(f"   Algorithm: PBKDF2-HMAC-SHA256")
+    print(f"   Backend: {pph.pbkdf2_backend}")
     print(f"   Iterations: {result['iterations']}")
     print(f"   Salt: {result['salt'][:32]}...")
     